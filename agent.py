@@ -4,39 +4,39 @@ Handles POI ranking, day allocation, and cost estimation.
 """
 
 import os
+import re
 from datetime import timedelta
+from functools import lru_cache
 from typing import List, Optional
-from pydantic_ai import Agent, RunContext
-from pydantic_ai.models.gemini import GeminiModel
-import math
+from math import asin, cos, radians, sin, sqrt
+import numpy as np
 
 from models import TripRequest, Place, DayPlan, Itinerary
+from scoring_numba import EARTH_DIAMETER_KM, score_places
 
 
 # Dependencies for the agent
 class PlannerDeps:
     """Dependencies passed to the agent."""
-    trip_request: TripRequest
-    available_places: List[Place]
-    city_coords: tuple[float, float]
+    
+    __slots__ = ("trip_request", "available_places", "city_coords")
+    
+    def __init__(self, trip_request: TripRequest, available_places: List[Place], city_coords: tuple[float, float]):
+        self.trip_request = trip_request
+        self.available_places = available_places
+        self.city_coords = city_coords
 
 
-# Initialize the agent
-try:
-    # Try to use Google Gemini if API key is available
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if api_key and api_key != "your_gemini_api_key_here":
-        model = GeminiModel("gemini-1.5-flash", api_key=api_key)
-    else:
-        # Fallback to test model (rule-based)
-        model = "test"
-except Exception:
+# Pick the planner model; the Pydantic AI agent itself is only built by _get_agent()
+api_key = os.getenv("GOOGLE_API_KEY")
+if api_key and api_key != "your_gemini_api_key_here":
+    # Use Google Gemini if API key is available
+    model = "gemini-1.5-flash"
+else:
+    # Fallback to test model (rule-based)
     model = "test"
 
-planner_agent = Agent(
-    model=model,
-    deps_type=PlannerDeps,
-    system_prompt="""You are an expert travel planner. Your job is to create balanced, 
+SYSTEM_PROMPT = """You are an expert travel planner. Your job is to create balanced, 
     enjoyable itineraries that respect the user's budget, interests, and pace preferences.
     
     Key principles:
@@ -51,78 +51,140 @@ planner_agent = Agent(
     
     Return a complete Itinerary object with all required fields.
     """
-)
 
 
-@planner_agent.tool
-def calculate_distance(ctx: RunContext[PlannerDeps], lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def _place_arrays(places: List[Place]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
-    Calculate distance between two coordinates using Haversine formula.
-    Returns distance in kilometers.
+    Extract the numeric Place fields used for scoring as flat arrays.
+    Missing ratings are stored as NaN.
     """
-    R = 6371  # Earth's radius in km
+    n = len(places)
+    lats = np.fromiter((p.latitude for p in places), float, n)
+    lons = np.fromiter((p.longitude for p in places), float, n)
+    costs = np.fromiter((p.estimated_cost for p in places), float, n)
+    ratings = np.fromiter((np.nan if p.rating is None else p.rating for p in places), float, n)
+    return lats, lons, costs, ratings
+
+
+def _interest_hits(places: List[Place], interests: List[str]) -> np.ndarray:
+    """Count, per place, how many interests appear in its category or name."""
+    hits = np.zeros(len(places))
+    if not places or not interests:
+        return hits
     
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+    # Lowercase every string once, then plain substring tests; each interest
+    # (duplicates and overlaps included) adds its own hit
+    categories = [place.category.lower() for place in places]
+    names = [place.name.lower() for place in places]
+    for interest in interests:
+        word = interest.lower()
+        hits += np.fromiter(
+            [word in category or word in name for category, name in zip(categories, names)],
+            bool,
+            len(places)
+        )
+    return hits
+
+
+def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance in kilometers between two coordinates."""
+    a = (
+        sin(radians(lat2 - lat1) / 2) ** 2
+        + cos(radians(lat1)) * cos(radians(lat2)) * sin(radians(lon2 - lon1) / 2) ** 2
+    )
+    return EARTH_DIAMETER_KM * asin(sqrt(a))
+
+
+def _haversine_matrix(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Pairwise Haversine distances in kilometers between all points."""
+    lat_rad = np.radians(lats)
+    lon_rad = np.radians(lons)
+    cos_lat = np.cos(lat_rad)
     
-    a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
-    c = 2 * math.asin(math.sqrt(a))
+    delta_lat = lat_rad[:, None] - lat_rad[None, :]
+    delta_lon = lon_rad[:, None] - lon_rad[None, :]
     
-    return R * c
+    a = np.sin(delta_lat / 2) ** 2 + np.outer(cos_lat, cos_lat) * np.sin(delta_lon / 2) ** 2
+    return EARTH_DIAMETER_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
 
 
-@planner_agent.tool
-def rank_places_by_relevance(ctx: RunContext[PlannerDeps]) -> List[Place]:
+def _cluster_days(
+    ranked_places: List[Place],
+    num_days: int,
+    places_per_day: int,
+    base_cost: float,
+    group_size: int,
+    budget_cap: float
+) -> List[List[Place]]:
     """
-    Rank available places by relevance to user interests and proximity to city center.
-    Returns sorted list of places.
-    """
-    places = ctx.deps.available_places
-    interests = ctx.deps.trip_request.interests
-    city_lat, city_lon = ctx.deps.city_coords
+    Split ranked places into per-day groups of nearby places.
     
-    scored_places = []
+    Each day is seeded with the best-ranked unassigned place that fits the budget,
+    then filled with the nearest unassigned places that still fit.
     
-    for place in places:
-        score = 0.0
-        
-        # Interest match score (0-10)
-        for interest in interests:
-            if interest.lower() in place.category.lower() or interest.lower() in place.name.lower():
-                score += 5.0
-        
-        # Proximity score (closer to center = higher score, max 5)
-        distance = calculate_distance(ctx, city_lat, city_lon, place.latitude, place.longitude)
-        proximity_score = max(0, 5 - (distance / 2))
-        score += proximity_score
-        
-        # Rating score (0-5)
-        if place.rating:
-            score += place.rating
+    Args:
+        ranked_places: Places sorted by relevance, best first
+        num_days: Number of days to fill
+        places_per_day: Maximum places per day
+        base_cost: Fixed cost already committed for each day (e.g. meals)
+        group_size: Number of travelers paying each entry fee
+        budget_cap: Maximum total cost for a day
         
-        # Lower cost = slightly higher score for budget travelers
-        if place.estimated_cost < ctx.deps.trip_request.daily_budget / 3:
-            score += 2.0
+    Returns:
+        One list of places per day
+    """
+    days = [[] for _ in range(num_days)]
+    if not ranked_places:
+        return days
+    
+    lats, lons, costs, _ = _place_arrays(ranked_places)
+    distances = _haversine_matrix(lats, lons)
+    party_costs = costs * group_size
+    assigned = np.zeros(len(ranked_places), dtype=bool)
+    
+    for day_places in days:
+        affordable = np.flatnonzero(~assigned & (base_cost + party_costs <= budget_cap))
+        if affordable.size == 0:
+            continue
         
-        scored_places.append((place, score))
+        # The seed sorts first in its own row (distance 0), so it is picked up below
+        day_cost = base_cost
+        for i in np.argsort(distances[affordable[0]], kind="stable"):
+            if len(day_places) == places_per_day:
+                break
+            if assigned[i] or day_cost + party_costs[i] > budget_cap:
+                continue
+            assigned[i] = True
+            day_places.append(ranked_places[i])
+            day_cost += party_costs[i]
     
-    # Sort by score descending
-    scored_places.sort(key=lambda x: x[1], reverse=True)
+    return days
+
+
+def _rank(places: List[Place], trip: TripRequest, city_coords: tuple[float, float]) -> List[Place]:
+    """
+    Rank places by relevance to user interests and proximity to city center.
+    Returns sorted list of places.
+    """
+    if not places:
+        return []
+    
+    city_lat, city_lon = city_coords
+    lats, lons, costs, ratings = _place_arrays(places)
+    hits = _interest_hits(places, trip.interests)
+    score = score_places(lats, lons, costs, ratings, hits, city_lat, city_lon, trip.daily_budget)
     
-    return [place for place, score in scored_places]
+    # Sort by score descending (stable, so ties keep API order)
+    order = np.argsort(-score, kind="stable")
+    
+    return [places[i] for i in order]
 
 
-@planner_agent.tool
-def allocate_places_to_days(ctx: RunContext[PlannerDeps], ranked_places: List[Place]) -> List[DayPlan]:
+def _allocate(ranked_places: List[Place], trip: TripRequest) -> List[DayPlan]:
     """
     Allocate ranked places to specific days based on pace and budget.
     Returns list of DayPlan objects.
     """
-    trip = ctx.deps.trip_request
-    num_days = trip.num_days
-    
     # Determine places per day based on pace
     pace_map = {
         "relaxed": 2,
@@ -131,39 +193,27 @@ def allocate_places_to_days(ctx: RunContext[PlannerDeps], ranked_places: List[Pl
     }
     target_places_per_day = pace_map.get(trip.pace, 3)
     
-    daily_plans = []
-    current_place_index = 0
+    # Per-day fixed costs and budget
+    group_size = trip.group_size
+    budget_cap = trip.daily_budget * 1.2
+    meal_cost = 40.0 * group_size  # breakfast, lunch, dinner
+    transport_cost = 15.0 * group_size
+    notes = f"Includes meals (~${meal_cost:.0f}) and transport (~${transport_cost:.0f})"
     
-    for day_num in range(1, num_days + 1):
+    # Group nearby places into the same day
+    day_groups = _cluster_days(ranked_places, trip.num_days, target_places_per_day, meal_cost, group_size, budget_cap)
+    
+    daily_plans = []
+    for day_num, day_places in enumerate(day_groups, 1):
         day_date = trip.start_date + timedelta(days=day_num - 1)
-        day_places = []
-        day_cost = 0.0
         
-        # Add meal costs (breakfast, lunch, dinner)
-        meal_cost = 40.0 * trip.group_size
-        day_cost += meal_cost
-        
-        # Add places for this day
-        while (
-            len(day_places) < target_places_per_day 
-            and current_place_index < len(ranked_places)
-            and day_cost + ranked_places[current_place_index].estimated_cost * trip.group_size <= trip.daily_budget * 1.2
-        ):
-            place = ranked_places[current_place_index]
-            day_places.append(place)
-            day_cost += place.estimated_cost * trip.group_size
-            current_place_index += 1
-        
-        # Add transport cost estimate
-        transport_cost = 15.0 * trip.group_size
-        day_cost += transport_cost
-        
-        notes = f"Includes meals (~${meal_cost:.0f}) and transport (~${transport_cost:.0f})"
+        # Meals, places and transport
+        day_cost = meal_cost + sum(place.estimated_cost for place in day_places) * group_size + transport_cost
         
         daily_plans.append(
             DayPlan(
                 day_index=day_num,
-                date=day_date,
+                day_date=day_date,
                 places=day_places,
                 total_cost=round(day_cost, 2),
                 notes=notes
@@ -173,7 +223,81 @@ def allocate_places_to_days(ctx: RunContext[PlannerDeps], ranked_places: List[Pl
     return daily_plans
 
 
-def create_itinerary(trip_request: TripRequest, places: List[Place], city_coords: tuple[float, float]) -> Itinerary:
+@lru_cache(maxsize=1)
+def _get_agent():
+    """
+    Build the Pydantic AI planner agent on first use.
+    
+    pydantic_ai is imported here rather than at module load, so the
+    rule-based planner never pays its import cost. If the agent cannot be
+    built, the module falls back to the "test" model for the rest of the
+    process and None is cached, so the failure is reported only once.
+    """
+    global model
+    
+    try:
+        from pydantic_ai import Agent, RunContext
+        from pydantic_ai.models.gemini import GeminiModel
+        
+        planner_agent = Agent(
+            model=GeminiModel(model, api_key=api_key),
+            deps_type=PlannerDeps,
+            system_prompt=SYSTEM_PROMPT
+        )
+    except Exception as e:
+        print(f"Could not build AI agent, using simple planner: {e}")
+        model = "test"
+        return None
+    
+    @planner_agent.tool
+    def calculate_distance(ctx: RunContext[PlannerDeps], lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """
+        Calculate distance between two coordinates using Haversine formula.
+        Returns distance in kilometers.
+        """
+        return _haversine(lat1, lon1, lat2, lon2)
+    
+    @planner_agent.tool
+    def rank_places_by_relevance(ctx: RunContext[PlannerDeps]) -> List[Place]:
+        """
+        Rank available places by relevance to user interests and proximity to city center.
+        Returns sorted list of places.
+        """
+        return _rank(ctx.deps.available_places, ctx.deps.trip_request, ctx.deps.city_coords)
+    
+    @planner_agent.tool
+    def allocate_places_to_days(ctx: RunContext[PlannerDeps], ranked_places: List[Place]) -> List[DayPlan]:
+        """
+        Allocate ranked places to specific days based on pace and budget.
+        Returns list of DayPlan objects.
+        """
+        return _allocate(ranked_places, ctx.deps.trip_request)
+    
+    return planner_agent
+
+
+class PlannerError(RuntimeError):
+    """Raised when the AI agent fails and the rule-based fallback is disabled."""
+
+
+def planner_model() -> str:
+    """
+    Name of the model create_itinerary will use, or "test" for the rule-based planner.
+    
+    Builds the agent when an LLM is configured, so a setup that cannot build
+    it already reports "test" here.
+    """
+    if model != "test":
+        _get_agent()
+    return model
+
+
+def create_itinerary(
+    trip_request: TripRequest,
+    places: List[Place],
+    city_coords: tuple[float, float],
+    fallback: bool = True
+) -> Itinerary:
     """
     Main function to create a complete itinerary using the Pydantic AI agent.
     
@@ -181,13 +305,16 @@ def create_itinerary(trip_request: TripRequest, places: List[Place], city_coords
         trip_request: User's trip requirements
         places: Available POIs from API
         city_coords: (latitude, longitude) of the city center
+        fallback: Use the rule-based planner when the agent run fails;
+            if False, raise PlannerError instead
         
     Returns:
         Complete Itinerary object
     """
     
-    # For test model, use simple rule-based approach
-    if model == "test":
+    # For test model, or when the agent could not be built, use simple rule-based approach
+    planner_agent = _get_agent() if model != "test" else None
+    if planner_agent is None:
         return create_itinerary_simple(trip_request, places, city_coords)
     
     # For OpenAI model, use AI agent
@@ -213,6 +340,8 @@ def create_itinerary(trip_request: TripRequest, places: List[Place], city_coords
         return result.data
         
     except Exception as e:
+        if not fallback:
+            raise PlannerError(f"AI agent failed: {e}") from e
         print(f"Error using AI agent, falling back to simple planner: {e}")
         return create_itinerary_simple(trip_request, places, city_coords)
 
@@ -230,80 +359,8 @@ def create_itinerary_simple(trip_request: TripRequest, places: List[Place], city
         Complete Itinerary object
     """
     
-    # Rank places by relevance
-    scored_places = []
-    interests = trip_request.interests
-    city_lat, city_lon = city_coords
-    
-    for place in places:
-        score = 0.0
-        
-        # Interest match
-        for interest in interests:
-            if interest.lower() in place.category.lower() or interest.lower() in place.name.lower():
-                score += 5.0
-        
-        # Proximity to center
-        distance = math.sqrt(
-            (place.latitude - city_lat) ** 2 + (place.longitude - city_lon) ** 2
-        )
-        score += max(0, 5 - distance * 100)
-        
-        # Rating
-        if place.rating:
-            score += place.rating
-        
-        # Budget friendly
-        if place.estimated_cost < trip_request.daily_budget / 3:
-            score += 2.0
-        
-        scored_places.append((place, score))
-    
-    scored_places.sort(key=lambda x: x[1], reverse=True)
-    ranked_places = [place for place, score in scored_places]
-    
-    # Allocate to days
-    pace_map = {"relaxed": 2, "moderate": 3, "packed": 5}
-    target_places_per_day = pace_map.get(trip_request.pace, 3)
-    
-    daily_plans = []
-    current_index = 0
-    
-    for day_num in range(1, trip_request.num_days + 1):
-        day_date = trip_request.start_date + timedelta(days=day_num - 1)
-        day_places = []
-        day_cost = 0.0
-        
-        # Meals
-        meal_cost = 40.0 * trip_request.group_size
-        day_cost += meal_cost
-        
-        # Add places
-        while (
-            len(day_places) < target_places_per_day 
-            and current_index < len(ranked_places)
-            and day_cost + ranked_places[current_index].estimated_cost * trip_request.group_size <= trip_request.daily_budget * 1.2
-        ):
-            place = ranked_places[current_index]
-            day_places.append(place)
-            day_cost += place.estimated_cost * trip_request.group_size
-            current_index += 1
-        
-        # Transport
-        transport_cost = 15.0 * trip_request.group_size
-        day_cost += transport_cost
-        
-        notes = f"Includes meals (~${meal_cost:.0f}) and transport (~${transport_cost:.0f})"
-        
-        daily_plans.append(
-            DayPlan(
-                day_index=day_num,
-                day_date=day_date,
-                places=day_places,
-                total_cost=round(day_cost, 2),
-                notes=notes
-            )
-        )
+    ranked_places = _rank(places, trip_request, city_coords)
+    daily_plans = _allocate(ranked_places, trip_request)
     
     total_cost = sum(day.total_cost for day in daily_plans)
     
@@ -1,14 +1,55 @@
 """
 API clients for external services.
-Handles geocoding (Nominatim) and POI discovery (OpenTripMap).
+Handles geocoding (Nominatim) and POI discovery (Overpass).
+POI details arrive inline with each Overpass search, so there are no per-POI detail requests.
 """
 
+import aiohttp
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import math
 import os
 import requests
+import shelve
+import threading
 import time
+from functools import lru_cache
+from itertools import chain, zip_longest
 from typing import List, Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from models import Place
 
+logger = logging.getLogger(__name__)
+
+# orjson parses large Overpass payloads 2-3x faster; the stdlib also accepts bytes
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+
+def _create_session(headers: Dict[str, str]) -> requests.Session:
+    """
+    Create a pooled HTTP session with keep-alive and retries.
+    
+    Transient failures (429/5xx, connection errors) are retried twice with
+    exponential backoff before the error reaches the caller.
+    """
+    session = requests.Session()
+    session.headers.update(headers)
+    retry = Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    return session
+
 
 class NominatimClient:
     """Client for Nominatim geocoding API."""
@@ -24,6 +65,7 @@ class NominatimClient:
         """
         self.user_agent = user_agent
         self.headers = {"User-Agent": user_agent}
+        self.session = _create_session(self.headers)
     
     def geocode_city(self, city_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -36,37 +78,44 @@ class NominatimClient:
             Dictionary with lat, lon, display_name, and bounding box, or None if not found
         """
         try:
-            params = {
-                "q": city_name,
-                "format": "json",
-                "limit": 1,
-                "addressdetails": 1
-            }
-            
-            response = requests.get(
-                f"{self.BASE_URL}/search",
-                params=params,
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            print(f"DEBUG: Geocoding '{city_name}' returned {len(data)} result(s)")
-            if not data:
-                return None
-            
-            result = data[0]
-            return {
-                "latitude": float(result["lat"]),
-                "longitude": float(result["lon"]),
-                "display_name": result.get("display_name", city_name),
-                "boundingbox": result.get("boundingbox")
-            }
-            
+            return self._geocode(city_name)
         except Exception as e:
-            print(f"Error geocoding city {city_name}: {e}")
+            logger.warning("Error geocoding city %s: %s", city_name, e)
             return None
+    
+    @lru_cache(maxsize=512)
+    def _geocode(self, city_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Query Nominatim for a city, memoized per city name.
+        
+        Network errors propagate so that failed lookups are never cached.
+        """
+        params = {
+            "q": city_name,
+            "format": "json",
+            "limit": 1,
+            "addressdetails": 1
+        }
+        
+        response = self.session.get(
+            f"{self.BASE_URL}/search",
+            params=params,
+            timeout=10
+        )
+        response.raise_for_status()
+        
+        data = _json_loads(response.content)
+        logger.debug("Geocoding '%s' returned %d result(s)", city_name, len(data))
+        if not data:
+            return None
+        
+        result = data[0]
+        return {
+            "latitude": float(result["lat"]),
+            "longitude": float(result["lon"]),
+            "display_name": result.get("display_name", city_name),
+            "boundingbox": result.get("boundingbox")
+        }
 
 
 class OverpassPOIClient:
@@ -81,26 +130,73 @@ class OverpassPOIClient:
     
     # OSM tag mapping for interests
     INTEREST_TO_OSM_TAGS = {
-        "museums": ["tourism=museum"],
-        "history": ["tourism=museum", "historic=monument", "historic=castle"],
-        "culture": ["tourism=museum", "tourism=gallery", "tourism=theatre"],
-        "art": ["tourism=gallery", "tourism=artwork"],
-        "nature": ["leisure=park", "leisure=garden", "natural=beach"],
-        "parks": ["leisure=park", "leisure=garden"],
-        "outdoor": ["leisure=park", "natural=peak", "tourism=viewpoint"],
-        "food": ["amenity=restaurant", "amenity=cafe", "amenity=bar"],
-        "restaurants": ["amenity=restaurant", "amenity=cafe"],
-        "architecture": ["tourism=attraction", "historic=building", "building=cathedral"],
-        "religion": ["amenity=place_of_worship", "building=church", "building=mosque"],
-        "sport": ["leisure=sports_centre", "leisure=stadium"],
-        "shopping": ["shop=mall", "shop=department_store"],
-        "entertainment": ["tourism=attraction", "leisure=amusement_arcade"],
-        "amusements": ["tourism=theme_park", "leisure=amusement_arcade"]
+        "museums": ("tourism=museum",),
+        "history": ("tourism=museum", "historic=monument", "historic=castle"),
+        "culture": ("tourism=museum", "tourism=gallery", "tourism=theatre"),
+        "art": ("tourism=gallery", "tourism=artwork"),
+        "nature": ("leisure=park", "leisure=garden", "natural=beach"),
+        "parks": ("leisure=park", "leisure=garden"),
+        "outdoor": ("leisure=park", "natural=peak", "tourism=viewpoint"),
+        "food": ("amenity=restaurant", "amenity=cafe", "amenity=bar"),
+        "restaurants": ("amenity=restaurant", "amenity=cafe"),
+        "architecture": ("tourism=attraction", "historic=building", "building=cathedral"),
+        "religion": ("amenity=place_of_worship", "building=church", "building=mosque"),
+        "sport": ("leisure=sports_centre", "leisure=stadium"),
+        "shopping": ("shop=mall", "shop=department_store"),
+        "entertainment": ("tourism=attraction", "leisure=amusement_arcade"),
+        "amusements": ("tourism=theme_park", "leisure=amusement_arcade")
     }
     
-    def __init__(self):
-        """Initialize Overpass API client (no API key needed)."""
+    # Tags queried when the user picked no interests
+    DEFAULT_TAGS = ("tourism=museum", "amenity=restaurant", "leisure=park")
+    
+    # (OSM key, value) -> category; keys are checked in CATEGORY_KEYS order
+    CATEGORY_KEYS = ("tourism", "amenity", "leisure")
+    TAG_CATEGORIES = {
+        ("tourism", "museum"): "museum",
+        ("tourism", "gallery"): "art_gallery",
+        ("tourism", "attraction"): "attraction",
+        ("tourism", "viewpoint"): "viewpoint",
+        ("amenity", "restaurant"): "restaurant",
+        ("amenity", "cafe"): "cafe",
+        ("amenity", "place_of_worship"): "religious_site",
+        ("leisure", "park"): "park",
+        ("leisure", "garden"): "garden"
+    }
+    
+    # Delay before each fallback server joins the race
+    SERVER_STAGGER = 0.3  # seconds
+    
+    # Upper bound on concurrent Overpass requests per fetch
+    MAX_CONCURRENT_REQUESTS = 5
+    
+    # On-disk POI cache shared across runs
+    CACHE_PATH = os.path.join(os.path.expanduser("~"), ".travel_guide_cache")
+    CACHE_TTL = 7 * 24 * 3600  # seconds
+    CACHE_VERSION = 2  # bump when the pickled Place layout changes
+    
+    def __init__(self, cache_path: Optional[str] = None):
+        """
+        Initialize Overpass API client (no API key needed).
+        
+        Args:
+            cache_path: Location of the on-disk POI cache (defaults to CACHE_PATH)
+        """
         self.headers = {"User-Agent": "TravelItineraryBuilder/1.0"}
+        self.cache_path = cache_path or self.CACHE_PATH
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Interest tag sets are few and fixed, so prebuild their query templates;
+        # other combinations are memoized by _build_query on first use
+        self._query_templates: Dict[tuple[frozenset, bool], str] = {}
+        known_tag_sets = [list(tags) for tags in self.INTEREST_TO_OSM_TAGS.values()]
+        known_tag_sets += [list(self.DEFAULT_TAGS), ["tourism=attraction"]]
+        for tags in known_tag_sets:
+            for require_name in (True, False):
+                key = (frozenset(tags[:3]), require_name)
+                self._query_templates[key] = self._query_template(tags[:3], require_name)
     
     def fetch_pois(
         self,
@@ -113,6 +209,32 @@ class OverpassPOIClient:
         """
         Fetch points of interest within a radius using OpenStreetMap data.
         
+        Blocking wrapper around afetch_pois; from a running event loop,
+        await afetch_pois directly instead.
+        
+        Args:
+            latitude: Center latitude
+            longitude: Center longitude
+            radius: Search radius in meters
+            interests: List of interest categories
+            limit: Maximum number of POIs to return
+            
+        Returns:
+            List of Place objects
+        """
+        return asyncio.run(self.afetch_pois(latitude, longitude, radius, interests, limit))
+    
+    async def afetch_pois(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: int = 10000,
+        interests: Optional[List[str]] = None,
+        limit: int = 50
+    ) -> List[Place]:
+        """
+        Fetch points of interest within a radius using OpenStreetMap data.
+        
         Args:
             latitude: Center latitude
             longitude: Center longitude
@@ -123,91 +245,305 @@ class OverpassPOIClient:
         Returns:
             List of Place objects
         """
+        cache_key = self._cache_key(latitude, longitude, radius, interests, limit)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.debug("Using %d cached POIs", len(cached))
+            return cached
+        
+        # Concurrent misses on the same key (other sessions run in other threads and
+        # event loops) wait on the first caller's result instead of querying again
+        with self._inflight_lock:
+            pending = self._inflight.get(cache_key)
+            if pending is None:
+                future = self._inflight[cache_key] = concurrent.futures.Future()
+        if pending is not None:
+            logger.debug("Waiting for in-flight POI request")
+            return list(await asyncio.wrap_future(pending))
+        
+        try:
+            places = await self._fetch_and_cache(cache_key, latitude, longitude, radius, interests, limit)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(places)
+            return places
+        finally:
+            with self._inflight_lock:
+                del self._inflight[cache_key]
+    
+    async def _fetch_and_cache(
+        self,
+        cache_key: str,
+        latitude: float,
+        longitude: float,
+        radius: int,
+        interests: Optional[List[str]],
+        limit: int
+    ) -> List[Place]:
+        """Query Overpass for a cache miss and store non-empty results."""
         places = []
         
         # Get OSM tags based on interests
         if interests:
             osm_tags = self._map_interests_to_tags(interests)
         else:
-            osm_tags = ["tourism=museum", "amenity=restaurant", "leisure=park"]
+            osm_tags = self.DEFAULT_TAGS
         
-        # Build Overpass query
-        query = self._build_query(latitude, longitude, radius, osm_tags)
-        
-        # Try multiple Overpass servers
-        last_error = None
-        for server_url in self.OVERPASS_SERVERS:
-            try:
-                print(f"DEBUG: Fetching POIs from OpenStreetMap at ({latitude}, {longitude}) via {server_url}")
-                response = requests.post(
-                    server_url,
-                    data={"data": query},
-                    headers=self.headers,
-                    timeout=15
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                elements = data.get("elements", [])
-                print(f"DEBUG: Found {len(elements)} POIs from OpenStreetMap")
-                break  # Success, exit the loop
-            except Exception as e:
-                last_error = e
-                print(f"DEBUG: Server {server_url} failed: {e}")
-                continue
-        else:
-            # All servers failed
-            raise last_error if last_error else Exception("All Overpass servers failed")
+        # Overpass times out on long unions, so query the tags in groups of 3 concurrently
+        logger.debug("Fetching POIs from OpenStreetMap at (%s, %s)", latitude, longitude)
+        tag_groups = [osm_tags[i:i + 3] for i in range(0, len(osm_tags), 3)]
+        elements = await self._fetch_elements(latitude, longitude, radius, tag_groups, limit)
+        logger.debug("Found %d POIs from OpenStreetMap", len(elements))
         
         try:
             
             # Process each element
-            for element in elements[:limit]:
+            for element in elements:
                 try:
                     place = self._parse_element(element)
                     if place:
                         places.append(place)
                 except Exception as e:
-                    print(f"Error parsing element: {e}")
+                    logger.debug("Error parsing element: %s", e)
                     continue
             
-            print(f"DEBUG: Successfully parsed {len(places)} places")
+            logger.debug("Successfully parsed %d places", len(places))
+            if places:
+                self._cache_set(cache_key, places)
             return places
             
         except Exception as e:
-            print(f"Error fetching POIs from Overpass API: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("Error fetching POIs from Overpass API: %s", e)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Traceback:", exc_info=True)
             return []
     
+    async def _fetch_elements(
+        self,
+        lat: float,
+        lon: float,
+        radius: int,
+        tag_groups: List[List[str]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Run one Overpass query per tag group concurrently and merge the results.
+        
+        Results are interleaved across groups so every interest is represented,
+        de-duplicated by OSM (type, id) and truncated to limit. Raises only if
+        every group fails.
+        """
+        # Bound in-flight requests across all groups and servers to stay clear of 429s
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        timeout = aiohttp.ClientTimeout(total=15)
+        async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
+            outcomes = await asyncio.gather(
+                *(self._query_tag_group(session, semaphore, lat, lon, radius, tags, limit) for tags in tag_groups),
+                return_exceptions=True
+            )
+        
+        results = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+        if not results:
+            raise outcomes[-1] if outcomes else Exception("All Overpass servers failed")
+        
+        merged = {}
+        for element in chain.from_iterable(zip_longest(*results)):
+            if element is not None:
+                merged.setdefault((element.get("type"), element.get("id")), element)
+        return list(merged.values())[:limit]
+    
+    async def _query_tag_group(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        lat: float,
+        lon: float,
+        radius: int,
+        tags: List[str],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Query Overpass for one group of up to 3 tags."""
+        query = self._build_query(lat, lon, radius, tags, limit)
+        elements = await self._post_query(session, semaphore, query)
+        if not elements:
+            # Places tagged only with name:en/official_name are dropped by the name filter
+            logger.debug("No named POIs found for %s, retrying without the name filter", tags)
+            query = self._build_query(lat, lon, radius, tags, limit, require_name=False)
+            elements = await self._post_query(session, semaphore, query)
+        return elements
+    
+    async def _post_query(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        query: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Send a query to every Overpass server and return the first successful result.
+        
+        Servers are started SERVER_STAGGER seconds apart in list order, so a healthy
+        primary answers before the mirrors are hit; a failing server releases the
+        next one immediately. Requests still in flight are cancelled once one
+        succeeds. Raises the last error if every server fails.
+        """
+        pending = set()
+        last_error = None
+        
+        def first_success(done):
+            nonlocal last_error
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+            return None
+        
+        try:
+            for server_url in self.OVERPASS_SERVERS:
+                pending.add(asyncio.create_task(self._post_to_server(session, semaphore, server_url, query)))
+                done, pending = await asyncio.wait(
+                    pending, timeout=self.SERVER_STAGGER, return_when=asyncio.FIRST_COMPLETED
+                )
+                elements = first_success(done)
+                if elements is not None:
+                    return elements
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                elements = first_success(done)
+                if elements is not None:
+                    return elements
+        finally:
+            # Don't wait on slower servers once we have an answer
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        # All servers failed
+        raise last_error if last_error else Exception("All Overpass servers failed")
+    
+    async def _post_to_server(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        server_url: str,
+        query: str
+    ) -> List[Dict[str, Any]]:
+        """POST a query to a single Overpass server and return its elements."""
+        try:
+            async with semaphore, session.post(server_url, data={"data": query}) as response:
+                response.raise_for_status()
+                data = _json_loads(await response.read())
+            return data.get("elements", [])
+        except Exception as e:
+            logger.debug("Server %s failed: %s", server_url, e)
+            raise
+    
+    def _cache_key(
+        self,
+        lat: float,
+        lon: float,
+        radius: int,
+        interests: Optional[List[str]],
+        limit: int
+    ) -> str:
+        """Build a stable cache key; coordinates are rounded to ~100 m."""
+        normalized = sorted(interest.lower() for interest in interests or [])
+        raw = f"v{self.CACHE_VERSION}:{round(lat, 3)},{round(lon, 3)},{radius},{normalized},{limit}"
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[List[Place]]:
+        """Return cached places for a key, or None if missing or expired."""
+        try:
+            with self._cache_lock, shelve.open(self.cache_path) as cache:
+                entry = cache.get(key)
+        except Exception as e:
+            logger.warning("Error reading POI cache: %s", e)
+            return None
+        
+        if entry is None:
+            return None
+        stored_at, places = entry
+        if time.time() - stored_at > self.CACHE_TTL:
+            return None
+        return places
+    
+    def _cache_set(self, key: str, places: List[Place]) -> None:
+        """Store places under a key together with the current timestamp."""
+        try:
+            with self._cache_lock, shelve.open(self.cache_path) as cache:
+                cache[key] = (time.time(), places)
+        except Exception as e:
+            logger.warning("Error writing POI cache: %s", e)
+    
     def _map_interests_to_tags(self, interests: List[str]) -> List[str]:
         """Map user interests to OSM tags."""
         tags = []
         for interest in interests:
-            interest_lower = interest.lower()
-            if interest_lower in self.INTEREST_TO_OSM_TAGS:
-                tags.extend(self.INTEREST_TO_OSM_TAGS[interest_lower])
+            tags.extend(self.INTEREST_TO_OSM_TAGS.get(interest.lower(), ()))
         
-        # Remove duplicates
-        return list(set(tags)) if tags else ["tourism=attraction"]
+        # Remove duplicates, keeping first-seen order so the query is deterministic
+        return list(dict.fromkeys(tags)) if tags else ["tourism=attraction"]
     
-    def _build_query(self, lat: float, lon: float, radius: int, tags: List[str]) -> str:
-        """Build Overpass QL query - simplified for better performance."""
+    def _build_query(
+        self,
+        lat: float,
+        lon: float,
+        radius: int,
+        tags: List[str],
+        limit: int = 50,
+        require_name: bool = True
+    ) -> str:
+        """
+        Build Overpass QL query - simplified for better performance.
+        
+        With require_name, unnamed nodes (which _parse_element would discard) are
+        filtered out server-side so they never cross the wire.
+        """
         # Limit to first 3 tags to avoid timeout
         tags = tags[:3]
         
-        # Build tag filters - only search nodes for better performance
+        key = (frozenset(tags), require_name)
+        template = self._query_templates.get(key)
+        if template is None:
+            template = self._query_templates[key] = self._query_template(tags, require_name)
+        
+        # A global bounding box lets the server prune spatially before the around filters
+        south, west, north, east = self._bounding_box(lat, lon, radius)
+        
+        return template.format(
+            lat=lat, lon=lon, radius=radius, limit=limit,
+            south=south, west=west, north=north, east=east
+        )
+    
+    @staticmethod
+    def _query_template(tags: List[str], require_name: bool) -> str:
+        """Build a query template with {lat}/{lon}/{radius}/{limit} and bbox placeholders."""
+        # Only search nodes for better performance
+        name_filter = '["name"]' if require_name else ""
         tag_filters = []
         for tag in tags:
             key, value = tag.split("=")
-            tag_filters.append(f'  node["{key}"="{value}"](around:{radius},{lat},{lon});')
+            tag_filters.append(f'  node["{key}"="{value}"]{name_filter}(around:{{radius}},{{lat}},{{lon}});')
         
-        query = f"""[out:json][timeout:10];
+        return f"""[out:json][timeout:10][bbox:{{south:.6f}},{{west:.6f}},{{north:.6f}},{{east:.6f}}];
 (
 {chr(10).join(tag_filters)}
 );
-out body 50;"""
-        return query
+out body {{limit}};"""
+    
+    @staticmethod
+    def _bounding_box(lat: float, lon: float, radius: int) -> tuple[float, float, float, float]:
+        """Return (south, west, north, east) of the box enclosing a circle of radius meters."""
+        delta_lat = radius / 111320.0  # meters per degree of latitude
+        delta_lon = delta_lat / max(math.cos(math.radians(lat)), 1e-6)
+        return (
+            max(lat - delta_lat, -90.0),
+            lon - delta_lon,
+            min(lat + delta_lat, 90.0),
+            lon + delta_lon
+        )
     
     def _parse_element(self, element: Dict[str, Any]) -> Optional[Place]:
         """Parse an OSM element into a Place object."""
@@ -240,8 +576,9 @@ out body 50;"""
             category = self._determine_category(tags)
             
             # Estimate cost and time
-            estimated_cost = self._estimate_cost(category, tags)
-            time_needed = self._estimate_time(category)
+            is_free = tags.get("fee", "").lower() == "no"
+            estimated_cost = _estimate_cost(category, is_free)
+            time_needed = _estimate_time(category)
             
             # Get opening hours if available
             hours = tags.get("opening_hours")
@@ -266,85 +603,79 @@ out body 50;"""
             )
             
         except Exception as e:
-            print(f"Error parsing element: {e}")
+            logger.debug("Error parsing element: %s", e)
             return None
     
     def _determine_category(self, tags: Dict[str, str]) -> str:
         """Determine category from OSM tags."""
         # Priority order for category determination
-        if tags.get("tourism") == "museum":
-            return "museum"
-        elif tags.get("tourism") == "gallery":
-            return "art_gallery"
-        elif tags.get("tourism") == "attraction":
-            return "attraction"
-        elif tags.get("tourism") == "viewpoint":
-            return "viewpoint"
-        elif tags.get("amenity") == "restaurant":
-            return "restaurant"
-        elif tags.get("amenity") == "cafe":
-            return "cafe"
-        elif tags.get("amenity") == "place_of_worship":
-            return "religious_site"
-        elif tags.get("leisure") == "park":
-            return "park"
-        elif tags.get("leisure") == "garden":
-            return "garden"
-        elif tags.get("historic"):
+        for key in self.CATEGORY_KEYS:
+            category = self.TAG_CATEGORIES.get((key, tags.get(key)))
+            if category:
+                return category
+        
+        if tags.get("historic"):
             return f"historic_{tags['historic']}"
         elif tags.get("shop"):
-            return f"shopping"
+            return "shopping"
         else:
             return "attraction"
+
+
+# Estimated entry cost per person in USD
+_CATEGORY_COSTS = {
+    "museum": 15.0,
+    "art_gallery": 12.0,
+    "park": 0.0,
+    "garden": 5.0,
+    "restaurant": 25.0,
+    "cafe": 15.0,
+    "religious_site": 0.0,
+    "attraction": 10.0,
+    "shopping": 20.0,
+    "viewpoint": 0.0
+}
+
+# Estimated visit time in minutes, matched by substring in this order
+_CATEGORY_TIMES = {
+    "museum": 120,
+    "art_gallery": 90,
+    "park": 60,
+    "garden": 45,
+    "restaurant": 90,
+    "cafe": 45,
+    "religious": 45,
+    "historic": 60,
+    "attraction": 90,
+    "shopping": 90,
+    "viewpoint": 30
+}
+
+
+# Categories come from a small closed set, so both estimates are memoized per category
+@lru_cache(maxsize=32)
+def _estimate_cost(category: str, is_free: bool) -> float:
+    """Estimate cost based on category and whether the POI is tagged fee=no."""
+    if is_free:
+        return 0.0
     
-    def _estimate_cost(self, category: str, tags: Dict[str, str]) -> float:
-        """Estimate cost based on category and tags."""
-        # Check if there's a fee tag
-        fee = tags.get("fee", "").lower()
-        if fee == "no":
-            return 0.0
-        
-        cost_map = {
-            "museum": 15.0,
-            "art_gallery": 12.0,
-            "park": 0.0,
-            "garden": 5.0,
-            "restaurant": 25.0,
-            "cafe": 15.0,
-            "religious_site": 0.0,
-            "historic": 10.0,
-            "attraction": 10.0,
-            "shopping": 20.0,
-            "viewpoint": 0.0
-        }
-        
-        for key, cost in cost_map.items():
-            if key in category.lower():
-                return cost
-        return 10.0
-    
-    def _estimate_time(self, category: str) -> int:
-        """Estimate time needed in minutes based on category."""
-        time_map = {
-            "museum": 120,
-            "art_gallery": 90,
-            "park": 60,
-            "garden": 45,
-            "restaurant": 90,
-            "cafe": 45,
-            "religious": 45,
-            "historic": 60,
-            "attraction": 90,
-            "shopping": 90,
-            "viewpoint": 30
-        }
-        
-        for key, time_min in time_map.items():
-            if key in category.lower():
-                return time_min
-        return 60
+    # historic_* categories fall through to the 10.0 default
+    return _CATEGORY_COSTS.get(category, 10.0)
+
+
+@lru_cache(maxsize=32)
+def _estimate_time(category: str) -> int:
+    """Estimate time needed in minutes based on category."""
+    category_lower = category.lower()
+    for key, time_min in _CATEGORY_TIMES.items():
+        if key in category_lower:
+            return time_min
+    return 60
 
 
-# Singleton instances
+# Singleton instances; Python imports this module once per process, so every
+# Streamlit rerun and session shares them. Only Nominatim keeps a pooled HTTP
+# session: each Overpass fetch opens its own aiohttp session, so POI cache
+# misses pay fresh connection and TLS setup.
 nominatim = NominatimClient()
 opentripmap = OverpassPOIClient()  # Using Overpass API instead of OpenTripMap
@@ -3,15 +3,25 @@ Travel Itinerary Builder - Streamlit Application
 Main UI for generating personalized travel itineraries using Pydantic AI.
 """
 
+import asyncio
+import hashlib
+import html
+import json
+import numpy as np
+import pandas as pd
 import streamlit as st
+import streamlit.components.v1 as components
 from datetime import date, timedelta
-import folium
-from streamlit_folium import st_folium
+from string import Template
 from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Optional
 
-from models import TripRequest
+from models import DayPlan, Itinerary, TripRequest
 from api_clients import nominatim, opentripmap
-from agent import create_itinerary
+from agent import PlannerError, create_itinerary, create_itinerary_simple, planner_model
+
+if TYPE_CHECKING:
+    import folium
 
 # Load environment variables
 load_dotenv()
@@ -24,61 +34,471 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: 700;
-        color: #1E3A8A;
-        margin-bottom: 0.5rem;
-    }
-    .sub-header {
-        font-size: 1.2rem;
-        color: #64748B;
-        margin-bottom: 2rem;
-    }
-    .day-card {
-        background-color: #F8FAFC;
-        border-left: 4px solid #3B82F6;
-        padding: 1.5rem;
-        margin: 1rem 0;
-        border-radius: 0.5rem;
-    }
-    .place-card {
-        background-color: white;
-        padding: 1rem;
-        margin: 0.5rem 0;
-        border-radius: 0.5rem;
-        border: 1px solid #E2E8F0;
-    }
-    .cost-badge {
-        background-color: #10B981;
-        color: white;
-        padding: 0.25rem 0.75rem;
-        border-radius: 1rem;
-        font-weight: 600;
-        font-size: 0.875rem;
-    }
-    .budget-warning {
-        background-color: #FEF3C7;
-        color: #92400E;
-        padding: 0.25rem 0.75rem;
-        border-radius: 1rem;
-        font-weight: 600;
-        font-size: 0.875rem;
+# Interests offered in the sidebar, in display order
+_INTEREST_OPTIONS = ["museums", "nature", "food", "architecture", "history", "art", "shopping", "entertainment"]
+
+# Query parameters that make up a shareable trip link
+_TRIP_QUERY_KEYS = ("city", "start", "end", "budget", "interests", "pace", "group")
+
+# Number of POIs fetched per search, which also caps the places in an itinerary
+_POI_LIMIT = 50
+
+# Above this many places the map switches to client-side marker clustering;
+# it has to stay below _POI_LIMIT or the clustered path can never run
+_MARKER_CLUSTER_THRESHOLD = 20
+
+# Builds a marker from one [lat, lon, popup, color, tooltip] row of a day layer
+_CLUSTER_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: "map-marker", prefix: "fa", markerColor: row[3]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[2], {maxWidth: 250});
+    marker.bindTooltip(row[4]);
+    return marker;
+}
+"""
+
+# Marker popup body; fields are HTML-escaped by _day_marker_rows
+_POPUP_TEMPLATE = Template("""
+<div style="width: 200px">
+    <h4>$name</h4>
+    <p><b>Day $day</b></p>
+    <p>$category</p>
+    <p>Cost: $$$cost/person</p>
+    <p>Time: ~$time min</p>
+</div>
+""")
+
+# Header styles; theme colors live in .streamlit/config.toml
+_MAIN_HEADER_STYLE = "font-size: 2.5rem; font-weight: 700; color: #1E3A8A; margin-bottom: 0.5rem;"
+_SUB_HEADER_STYLE = "font-size: 1.2rem; color: #64748B; margin-bottom: 2rem;"
+
+
+@st.cache_data(persist="disk", max_entries=1024, show_spinner=False)
+def _cached_geocode_city(city: str) -> dict:
+    """
+    Geocode a normalized city name, cached on disk across reruns and restarts.
+    
+    Raises LookupError when the city is not found, so misses are not cached.
+    """
+    city_data = nominatim.geocode_city(city)
+    if city_data is None:
+        raise LookupError(city)
+    return city_data
+
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_fetch_pois(latitude: float, longitude: float, radius: int, interests: tuple, limit: int) -> list:
+    """
+    Fetch POIs for a normalized (coordinates, radius, interests, limit) key.
+    
+    Kept in memory only; fetch_pois already keeps its own 7-day cache on disk.
+    Raises LookupError when nothing is found, so empty results are not cached.
+    """
+    places = asyncio.run(opentripmap.afetch_pois(
+        latitude=latitude,
+        longitude=longitude,
+        radius=radius,
+        interests=list(interests),
+        limit=limit
+    ))
+    if not places:
+        raise LookupError(latitude, longitude)
+    return places
+
+
+# Bump when the pickled Itinerary layout changes so stale disk entries are skipped
+_ITINERARY_CACHE_VERSION = 2
+
+
+def _hash_places(places: list) -> str:
+    """Content hash of a POI list, used as the itinerary cache key."""
+    # Coordinates go in as one packed int32 block rather than float text
+    coords = np.array([place.coords_e5 for place in places], dtype=np.int32)
+    attributes = json.dumps([
+        (place.name, place.category, place.estimated_cost, place.hours,
+         place.description, place.rating, place.time_needed, place.address)
+        for place in places
+    ])
+    digest = hashlib.sha1(coords.tobytes())
+    digest.update(attributes.encode())
+    return digest.hexdigest()
+
+
+def _hash_trip_request(trip_request: TripRequest) -> str:
+    """
+    Cache key for a trip request, including the planner in use.
+    
+    Plans made by the rule-based planner are not reused once an LLM is configured.
+    """
+    return f"v{_ITINERARY_CACHE_VERSION}:{planner_model()}:{trip_request.model_dump_json()}"
+
+
+@st.cache_data(
+    persist="disk",
+    max_entries=256,
+    show_spinner=False,
+    hash_funcs={TripRequest: _hash_trip_request, list: _hash_places}
+)
+def _cached_create_itinerary(trip_request: TripRequest, places: list, city_coords: tuple) -> Itinerary:
+    """
+    Create an itinerary, cached on disk by planner, trip request, POI set and city center.
+    
+    Any change to the inputs produces a new key, so repeated clicks on the same
+    trip never pay for a second LLM call. Raises PlannerError when the AI agent
+    fails, so a one-off fallback plan is never cached.
+    """
+    return create_itinerary(trip_request, places, city_coords, fallback=False)
+
+
+def _trip_request_from_query_params() -> Optional[TripRequest]:
+    """
+    Rebuild a shared trip request from the URL query parameters.
+    
+    Returns None unless every parameter is present, valid, and within the
+    ranges the sidebar widgets accept.
+    """
+    params = st.query_params
+    if not all(key in params for key in _TRIP_QUERY_KEYS):
+        return None
+    
+    try:
+        trip_request = TripRequest(
+            city=params["city"],
+            start_date=date.fromisoformat(params["start"]),
+            end_date=date.fromisoformat(params["end"]),
+            budget=float(params["budget"]),
+            interests=[interest for interest in params["interests"].split(",") if interest],
+            pace=params["pace"],
+            group_size=int(params["group"])
+        )
+    except ValueError:
+        return None
+    
+    if (
+        trip_request.start_date < date.today()
+        or not 100.0 <= trip_request.budget <= 50000.0
+        or not 1 <= trip_request.group_size <= 10
+    ):
+        return None
+    return trip_request
+
+
+def _trip_request_to_query_params(trip_request: TripRequest) -> None:
+    """Write a trip request into the URL so reloads and shared links restore it."""
+    st.query_params.update({
+        "city": trip_request.city,
+        "start": trip_request.start_date.isoformat(),
+        "end": trip_request.end_date.isoformat(),
+        "budget": str(trip_request.budget),
+        "interests": ",".join(trip_request.interests),
+        "pace": trip_request.pace,
+        "group": str(trip_request.group_size)
+    })
+
+
+def _day_marker_rows(day: DayPlan, color: str) -> list:
+    """
+    Flatten one day's places into marker rows for the map.
+    
+    Args:
+        day: Day whose places are drawn
+        color: Marker color for the day
+        
+    Returns:
+        Rows of [latitude, longitude, popup HTML, marker color, tooltip]
+    """
+    rows = []
+    for place in day.places:
+        lat_e5, lon_e5 = place.coords_e5
+        name = html.escape(place.name)
+        rows.append([
+            lat_e5 / 1e5,
+            lon_e5 / 1e5,
+            _POPUP_TEMPLATE.substitute(
+                name=name,
+                day=day.day_index,
+                category=html.escape(place.category.title()),
+                cost=f"{place.estimated_cost:.0f}",
+                time=place.time_needed
+            ),
+            color,
+            f"Day {day.day_index}: {name}"
+        ])
+    return rows
+
+
+def _day_marker_layer(day_index: int, rows: list, clustered: bool) -> "folium.FeatureGroup":
+    """
+    Build the map layer holding one day's places.
+    
+    Args:
+        day_index: Day number, used as the layer name
+        rows: Marker rows from _day_marker_rows
+        clustered: Render through FastMarkerCluster instead of individual Markers
+        
+    Returns:
+        Feature group that can be added to the map in one call
+    """
+    import folium
+    from folium.plugins import FastMarkerCluster
+    
+    layer = folium.FeatureGroup(name=f"Day {day_index}")
+    if not rows:
+        return layer
+    
+    if clustered:
+        FastMarkerCluster(rows, callback=_CLUSTER_MARKER_CALLBACK).add_to(layer)
+    else:
+        for latitude, longitude, popup_html, marker_color, tooltip in rows:
+            layer.add_child(folium.Marker(
+                [latitude, longitude],
+                popup=folium.Popup(popup_html, max_width=250),
+                tooltip=tooltip,
+                icon=folium.Icon(color=marker_color, icon="map-marker", prefix="fa")
+            ))
+    return layer
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _build_map_html(latitude: float, longitude: float, display_name: str, markers_json: str) -> str:
+    """
+    Render the itinerary map to a standalone HTML page.
+    
+    Cached on the city and the serialized marker rows, so reruns that don't
+    change the itinerary skip folium entirely.
+    
+    Args:
+        latitude: City center latitude
+        longitude: City center longitude
+        display_name: City name shown in the center marker popup
+        markers_json: JSON list of [day_index, rows] pairs
+        
+    Returns:
+        HTML document for the map
+    """
+    # folium (~300 ms to import) is only needed on a cache miss, so keep it off cold start
+    import folium
+    
+    # Create map centered on city
+    m = folium.Map(
+        location=[latitude, longitude],
+        zoom_start=13,
+        tiles="OpenStreetMap"
+    )
+    
+    # Add city center marker
+    folium.Marker(
+        [latitude, longitude],
+        popup=display_name,
+        tooltip="City Center",
+        icon=folium.Icon(color="red", icon="info-sign")
+    ).add_to(m)
+    
+    # Add one layer of markers per day; past the cluster threshold the
+    # markers are built client-side from raw rows instead of one Marker each
+    day_rows = json.loads(markers_json)
+    clustered = sum(len(rows) for _, rows in day_rows) > _MARKER_CLUSTER_THRESHOLD
+    for day_index, rows in day_rows:
+        m.add_child(_day_marker_layer(day_index, rows, clustered))
+    folium.LayerControl(collapsed=False).add_to(m)
+    
+    return m.get_root().render()
+
+
+def _itinerary_key(itinerary: Itinerary) -> str:
+    """Cheap cache key for an itinerary: its trip request and creation time."""
+    return f"{itinerary.trip_request.model_dump_json()}@{itinerary.created_at.isoformat()}"
+
+
+@st.cache_data(max_entries=64, show_spinner=False, hash_funcs={Itinerary: _itinerary_key})
+def _daily_costs_frame(itinerary: Itinerary) -> pd.DataFrame:
+    """Build the Daily Costs table once per itinerary."""
+    return pd.DataFrame({
+        "Day": [f"Day {day.day_index}" for day in itinerary.days],
+        "Date": [day.day_date.strftime("%b %d") for day in itinerary.days],
+        "Places": [day.place_count for day in itinerary.days],
+        "Attractions": itinerary.day_place_costs * itinerary.trip_request.group_size,
+        "Cost": [day.total_cost for day in itinerary.days]
+    })
+
+
+@st.fragment
+def _render_daily_tab(itinerary: Itinerary):
+    """Render the day-by-day itinerary tab."""
+    st.header("Day-by-Day Itinerary")
+    
+    for day in itinerary.days:
+        with st.expander(
+            f"**Day {day.day_index}** - {day.day_date.strftime('%A, %B %d, %Y')} "
+            f"({day.place_count} places, ${day.total_cost:.2f})",
+            expanded=True
+        ):
+            if day.notes:
+                st.caption(day.notes)
+            
+            if not day.places:
+                st.warning("No places scheduled for this day.")
+            else:
+                for idx, place in enumerate(day.places, 1):
+                    col1, col2 = st.columns([3, 1])
+                    
+                    with col1:
+                        st.markdown(f"**{idx}. {place.name}**")
+                        st.caption(f"📍 {place.category.title()}")
+                        
+                        if place.description:
+                            # Use a popover or just show truncated text instead of nested expander
+                            desc = place.description[:200] + "..." if len(place.description) > 200 else place.description
+                            st.caption(f"ℹ️ {desc}")
+                        
+                        if place.hours:
+                            st.caption(f"🕐 {place.hours}")
+                    
+                    with col2:
+                        cost_per_person = place.estimated_cost
+                        total_cost = cost_per_person * itinerary.trip_request.group_size
+                        
+                        if cost_per_person == 0:
+                            st.success("Free")
+                        else:
+                            st.info(f"${cost_per_person:.0f}/person")
+                            if itinerary.trip_request.group_size > 1:
+                                st.caption(f"${total_cost:.0f} total")
+                        
+                        st.caption(f"⏱️ ~{place.time_needed} min")
+                    
+                    st.divider()
+
+
+@st.fragment
+def _render_map_tab(itinerary: Itinerary, city_data: dict):
+    """Render the map tab with its legend."""
+    st.header("Map View")
+    
+    # Color scheme for days
+    colors = ["blue", "green", "purple", "orange", "darkred", "lightblue", "darkgreen"]
+    
+    markers_json = json.dumps([
+        [day.day_index, _day_marker_rows(day, colors[day.day_index % len(colors)])]
+        for day in itinerary.days
+    ])
+    map_html = _build_map_html(
+        city_data["latitude"],
+        city_data["longitude"],
+        city_data["display_name"],
+        markers_json
+    )
+    
+    # Display map
+    components.html(map_html, height=600)
+    
+    # Legend
+    st.subheader("Legend")
+    legend_cols = st.columns(len(itinerary.days) + 1)
+    
+    with legend_cols[0]:
+        st.markdown("🔴 **City Center**")
+    
+    for idx, day in enumerate(itinerary.days):
+        with legend_cols[idx + 1]:
+            color = colors[day.day_index % len(colors)]
+            color_emoji = {"blue": "🔵", "green": "🟢", "purple": "🟣", 
+                           "orange": "🟠", "darkred": "🔴", "lightblue": "🔵", 
+                           "darkgreen": "🟢"}.get(color, "⚪")
+            st.markdown(f"{color_emoji} **Day {day.day_index}**")
+
+
+@st.fragment
+def _render_cost_tab(itinerary: Itinerary):
+    """Render the cost breakdown tab."""
+    st.header("Cost Breakdown")
+    
+    # Daily costs table
+    st.subheader("Daily Costs")
+    
+    st.dataframe(
+        _daily_costs_frame(itinerary),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Attractions": st.column_config.NumberColumn(format="$%.2f"),
+            "Cost": st.column_config.NumberColumn(format="$%.2f")
+        }
+    )
+    
+    # Read the summary values once for the metrics, progress bar and breakdown
+    trip = itinerary.trip_request
+    group_size = trip.group_size
+    num_days = itinerary.num_days
+    total_cost = itinerary.total_cost
+    
+    # Budget comparison
+    st.subheader("Budget Comparison")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric("Total Budget", f"${trip.budget:,.2f}")
+        st.metric("Estimated Cost", f"${total_cost:,.2f}")
+        
+        remaining = itinerary.budget_remaining
+        if remaining >= 0:
+            st.success(f"Remaining: ${remaining:,.2f}")
+        else:
+            st.error(f"Over budget by: ${-remaining:,.2f}")
+    
+    with col2:
+        st.metric("Daily Budget", f"${trip.daily_budget:,.2f}")
+        
+        avg_daily_cost = total_cost / num_days
+        st.metric("Avg Daily Cost", f"${avg_daily_cost:,.2f}")
+        
+        if group_size > 1:
+            cost_per_person = total_cost / group_size
+            st.metric("Cost per Person", f"${cost_per_person:,.2f}")
+    
+    # Progress bar
+    budget_percentage = min(itinerary.budget_used_percentage / 100, 1.0)
+    st.progress(budget_percentage)
+    
+    # Cost categories breakdown
+    st.subheader("Estimated Cost Categories")
+    
+    total_places_cost = itinerary.cost_array.sum() * group_size
+    
+    meals_cost = 40.0 * group_size * num_days
+    transport_cost = 15.0 * group_size * num_days
+    
+    cost_breakdown = {
+        "Attractions & Activities": f"${total_places_cost:.2f}",
+        "Meals": f"${meals_cost:.2f}",
+        "Local Transport": f"${transport_cost:.2f}",
     }
-</style>
-""", unsafe_allow_html=True)
+    
+    for category, cost in cost_breakdown.items():
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            st.write(category)
+        with col2:
+            st.write(cost)
 
 
 def main():
     """Main application function."""
     
+    # A complete set of query parameters (from a reload or shared link) seeds the
+    # form and regenerates the itinerary once per session through the cached helpers;
+    # after that only the button runs the pipeline, so failed lookups are not
+    # retried on every widget interaction
+    shared_trip = _trip_request_from_query_params()
+    run_shared_link = shared_trip is not None and 'shared_link_handled' not in st.session_state
+    st.session_state['shared_link_handled'] = True
+    
     # Header
-    st.markdown('<div class="main-header">✈️ Travel Itinerary Builder</div>', unsafe_allow_html=True)
+    st.markdown(f'<div style="{_MAIN_HEADER_STYLE}">✈️ Travel Itinerary Builder</div>', unsafe_allow_html=True)
     st.markdown(
-        '<div class="sub-header">Generate personalized day-by-day itineraries powered by Pydantic AI</div>',
+        f'<div style="{_SUB_HEADER_STYLE}">Generate personalized day-by-day itineraries powered by Pydantic AI</div>',
         unsafe_allow_html=True
     )
     
@@ -89,7 +509,7 @@ def main():
         # City input
         city = st.text_input(
             "Destination City",
-            value="Paris",
+            value=shared_trip.city if shared_trip else "Paris",
             help="Enter the city you want to visit"
         )
         
@@ -98,13 +518,13 @@ def main():
         with col1:
             start_date = st.date_input(
                 "Start Date",
-                value=date.today() + timedelta(days=7),
+                value=shared_trip.start_date if shared_trip else date.today() + timedelta(days=7),
                 min_value=date.today()
             )
         with col2:
             end_date = st.date_input(
                 "End Date",
-                value=date.today() + timedelta(days=10),
+                value=shared_trip.end_date if shared_trip else date.today() + timedelta(days=10),
                 min_value=start_date + timedelta(days=1)
             )
         
@@ -113,7 +533,7 @@ def main():
             "Total Budget (USD)",
             min_value=100.0,
             max_value=50000.0,
-            value=1500.0,
+            value=shared_trip.budget if shared_trip else 1500.0,
             step=100.0,
             help="Your total budget for the entire trip"
         )
@@ -123,40 +543,26 @@ def main():
             "Group Size",
             min_value=1,
             max_value=10,
-            value=2,
+            value=shared_trip.group_size if shared_trip else 2,
             help="Number of travelers"
         )
         
         # Interests
         st.subheader("Interests")
-        interests = []
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.checkbox("Museums", value=True):
-                interests.append("museums")
-            if st.checkbox("Nature"):
-                interests.append("nature")
-            if st.checkbox("Food", value=True):
-                interests.append("food")
-            if st.checkbox("Architecture"):
-                interests.append("architecture")
-        
-        with col2:
-            if st.checkbox("History"):
-                interests.append("history")
-            if st.checkbox("Art"):
-                interests.append("art")
-            if st.checkbox("Shopping"):
-                interests.append("shopping")
-            if st.checkbox("Entertainment"):
-                interests.append("entertainment")
+        default_interests = shared_trip.interests if shared_trip else ["museums", "food"]
+        interests = st.multiselect(
+            "Interests",
+            options=_INTEREST_OPTIONS,
+            default=[interest for interest in default_interests if interest in _INTEREST_OPTIONS],
+            format_func=str.title,
+            label_visibility="collapsed"
+        )
         
         # Pace
         pace = st.select_slider(
             "Trip Pace",
             options=["relaxed", "moderate", "packed"],
-            value="moderate",
+            value=shared_trip.pace if shared_trip else "moderate",
             help="Relaxed: 2-3 places/day, Moderate: 3-4 places/day, Packed: 5-6 places/day"
         )
         
@@ -164,7 +570,7 @@ def main():
         generate_button = st.button("🎯 Generate Itinerary", type="primary", use_container_width=True)
     
     # Main content area
-    if generate_button:
+    if generate_button or run_shared_link:
         if not city:
             st.error("Please enter a destination city!")
             return
@@ -190,9 +596,9 @@ def main():
         
         # Show progress
         with st.spinner("🌍 Geocoding city..."):
-            city_data = nominatim.geocode_city(city)
-            
-            if not city_data:
+            try:
+                city_data = _cached_geocode_city(" ".join(city.split()).lower())
+            except LookupError:
                 st.error(f"Could not find city: {city}. Please try a different name.")
                 return
             
@@ -200,27 +606,34 @@ def main():
             st.success(f"Found: {city_data['display_name']}")
         
         with st.spinner("🔍 Discovering points of interest..."):
-            places = opentripmap.fetch_pois(
-                latitude=city_coords[0],
-                longitude=city_coords[1],
-                radius=10000,
-                interests=interests,
-                limit=50
-            )
-            
-            if not places:
+            try:
+                places = _cached_fetch_pois(
+                    round(city_coords[0], 5),
+                    round(city_coords[1], 5),
+                    radius=10000,
+                    interests=tuple(sorted(interests)),
+                    limit=_POI_LIMIT
+                )
+            except LookupError:
                 st.warning("No places found. Try adjusting your search criteria.")
                 return
             
             st.success(f"Found {len(places)} places!")
         
         with st.spinner("🤖 Creating your personalized itinerary..."):
-            itinerary = create_itinerary(trip_request, places, city_coords)
+            try:
+                itinerary = _cached_create_itinerary(trip_request, places, city_coords)
+            except PlannerError as e:
+                st.warning(f"AI planner unavailable, using the rule-based planner instead. ({e})")
+                itinerary = create_itinerary_simple(trip_request, places, city_coords)
             st.success("Itinerary created!")
         
         # Store in session state
         st.session_state['itinerary'] = itinerary
         st.session_state['city_data'] = city_data
+        
+        # Only a successful run becomes the shareable link
+        _trip_request_to_query_params(trip_request)
     
     # Display itinerary if it exists
     if 'itinerary' in st.session_state:
@@ -230,17 +643,20 @@ def main():
         # Summary section
         st.header("📋 Trip Summary")
         
+        total_cost = itinerary.total_cost
+        cost_over_budget = total_cost - itinerary.trip_request.budget
+        
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.metric("Duration", f"{itinerary.num_days} days")
         with col2:
             st.metric("Total Places", itinerary.total_places)
         with col3:
-            budget_color = "normal" if itinerary.total_cost <= itinerary.trip_request.budget else "inverse"
+            budget_color = "normal" if cost_over_budget <= 0 else "inverse"
             st.metric(
                 "Estimated Cost",
-                f"${itinerary.total_cost:,.0f}",
-                delta=f"{itinerary.total_cost - itinerary.trip_request.budget:+,.0f}",
+                f"${total_cost:,.0f}",
+                delta=f"{cost_over_budget:+,.0f}",
                 delta_color=budget_color
             )
         with col4:
@@ -252,185 +668,15 @@ def main():
         # Create tabs for different views
         tab1, tab2, tab3 = st.tabs(["📅 Daily Itinerary", "🗺️ Map View", "💰 Cost Breakdown"])
         
+        # Each tab is a fragment, so interacting inside one reruns only that tab
         with tab1:
-            # Display day-by-day itinerary
-            st.header("Day-by-Day Itinerary")
-            
-            for day in itinerary.days:
-                with st.expander(
-                    f"**Day {day.day_index}** - {day.day_date.strftime('%A, %B %d, %Y')} "
-                    f"({day.place_count} places, ${day.total_cost:.2f})",
-                    expanded=True
-                ):
-                    if day.notes:
-                        st.caption(day.notes)
-                    
-                    if not day.places:
-                        st.warning("No places scheduled for this day.")
-                    else:
-                        for idx, place in enumerate(day.places, 1):
-                            col1, col2 = st.columns([3, 1])
-                            
-                            with col1:
-                                st.markdown(f"**{idx}. {place.name}**")
-                                st.caption(f"📍 {place.category.title()}")
-                                
-                                if place.description:
-                                    # Use a popover or just show truncated text instead of nested expander
-                                    desc = place.description[:200] + "..." if len(place.description) > 200 else place.description
-                                    st.caption(f"ℹ️ {desc}")
-                                
-                                if place.hours:
-                                    st.caption(f"🕐 {place.hours}")
-                            
-                            with col2:
-                                cost_per_person = place.estimated_cost
-                                total_cost = cost_per_person * itinerary.trip_request.group_size
-                                
-                                if cost_per_person == 0:
-                                    st.success("Free")
-                                else:
-                                    st.info(f"${cost_per_person:.0f}/person")
-                                    if itinerary.trip_request.group_size > 1:
-                                        st.caption(f"${total_cost:.0f} total")
-                                
-                                st.caption(f"⏱️ ~{place.time_needed} min")
-                            
-                            st.divider()
+            _render_daily_tab(itinerary)
         
         with tab2:
-            # Map view
-            st.header("Map View")
-            
-            # Create map centered on city
-            m = folium.Map(
-                location=[city_data["latitude"], city_data["longitude"]],
-                zoom_start=13,
-                tiles="OpenStreetMap"
-            )
-            
-            # Add city center marker
-            folium.Marker(
-                [city_data["latitude"], city_data["longitude"]],
-                popup=city_data["display_name"],
-                tooltip="City Center",
-                icon=folium.Icon(color="red", icon="info-sign")
-            ).add_to(m)
-            
-            # Color scheme for days
-            colors = ["blue", "green", "purple", "orange", "darkred", "lightblue", "darkgreen"]
-            
-            # Add markers for each place
-            for day in itinerary.days:
-                color = colors[day.day_index % len(colors)]
-                
-                for place in day.places:
-                    popup_html = f"""
-                    <div style="width: 200px">
-                        <h4>{place.name}</h4>
-                        <p><b>Day {day.day_index}</b></p>
-                        <p>{place.category.title()}</p>
-                        <p>Cost: ${place.estimated_cost:.0f}/person</p>
-                        <p>Time: ~{place.time_needed} min</p>
-                    </div>
-                    """
-                    
-                    folium.Marker(
-                        [place.latitude, place.longitude],
-                        popup=folium.Popup(popup_html, max_width=250),
-                        tooltip=f"Day {day.day_index}: {place.name}",
-                        icon=folium.Icon(color=color, icon="map-marker", prefix="fa")
-                    ).add_to(m)
-            
-            # Display map
-            st_folium(m, width=None, height=600)
-            
-            # Legend
-            st.subheader("Legend")
-            legend_cols = st.columns(len(itinerary.days) + 1)
-            
-            with legend_cols[0]:
-                st.markdown("🔴 **City Center**")
-            
-            for idx, day in enumerate(itinerary.days):
-                with legend_cols[idx + 1]:
-                    color = colors[day.day_index % len(colors)]
-                    color_emoji = {"blue": "🔵", "green": "🟢", "purple": "🟣", 
-                                   "orange": "🟠", "darkred": "🔴", "lightblue": "🔵", 
-                                   "darkgreen": "🟢"}.get(color, "⚪")
-                    st.markdown(f"{color_emoji} **Day {day.day_index}**")
+            _render_map_tab(itinerary, city_data)
         
         with tab3:
-            # Cost breakdown
-            st.header("Cost Breakdown")
-            
-            # Daily costs table
-            st.subheader("Daily Costs")
-            
-            cost_data = []
-            for day in itinerary.days:
-                cost_data.append({
-                    "Day": f"Day {day.day_index}",
-                    "Date": day.day_date.strftime("%b %d"),
-                    "Places": day.place_count,
-                    "Cost": f"${day.total_cost:.2f}"
-                })
-            
-            st.table(cost_data)
-            
-            # Budget comparison
-            st.subheader("Budget Comparison")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.metric("Total Budget", f"${itinerary.trip_request.budget:,.2f}")
-                st.metric("Estimated Cost", f"${itinerary.total_cost:,.2f}")
-                
-                remaining = itinerary.budget_remaining
-                if remaining >= 0:
-                    st.success(f"Remaining: ${remaining:,.2f}")
-                else:
-                    st.error(f"Over budget by: ${-remaining:,.2f}")
-            
-            with col2:
-                st.metric("Daily Budget", f"${itinerary.trip_request.daily_budget:,.2f}")
-                
-                avg_daily_cost = itinerary.total_cost / itinerary.num_days
-                st.metric("Avg Daily Cost", f"${avg_daily_cost:,.2f}")
-                
-                if itinerary.trip_request.group_size > 1:
-                    cost_per_person = itinerary.total_cost / itinerary.trip_request.group_size
-                    st.metric("Cost per Person", f"${cost_per_person:,.2f}")
-            
-            # Progress bar
-            budget_percentage = min(itinerary.budget_used_percentage / 100, 1.0)
-            st.progress(budget_percentage)
-            
-            # Cost categories breakdown
-            st.subheader("Estimated Cost Categories")
-            
-            total_places_cost = sum(
-                place.estimated_cost * itinerary.trip_request.group_size
-                for day in itinerary.days
-                for place in day.places
-            )
-            
-            meals_cost = 40.0 * itinerary.trip_request.group_size * itinerary.num_days
-            transport_cost = 15.0 * itinerary.trip_request.group_size * itinerary.num_days
-            
-            cost_breakdown = {
-                "Attractions & Activities": f"${total_places_cost:.2f}",
-                "Meals": f"${meals_cost:.2f}",
-                "Local Transport": f"${transport_cost:.2f}",
-            }
-            
-            for category, cost in cost_breakdown.items():
-                col1, col2 = st.columns([2, 1])
-                with col1:
-                    st.write(category)
-                with col2:
-                    st.write(cost)
+            _render_cost_tab(itinerary)
 
 
 if __name__ == "__main__":
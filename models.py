@@ -1,10 +1,14 @@
 """
-Pydantic models for the Travel Itinerary Builder.
+Data models for the Travel Itinerary Builder.
 Defines the data structures for trip requests, places, daily plans, and complete itineraries.
+Trip requests come from user input and are validated with Pydantic; the rest are plain dataclasses.
 """
 
+from dataclasses import dataclass, field
 from datetime import date, datetime
+from functools import cached_property
 from typing import List, Optional
+import numpy as np
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -54,73 +58,114 @@ class TripRequest(BaseModel):
         return self.budget / max(self.num_days, 1)
 
 
-class Place(BaseModel):
-    """A point of interest (POI) with location and cost information."""
-    
-    name: str = Field(..., description="Place name")
-    category: str = Field(..., description="Place category (e.g., museum, park, restaurant)")
-    latitude: float = Field(..., description="Latitude coordinate")
-    longitude: float = Field(..., description="Longitude coordinate")
-    estimated_cost: float = Field(default=0.0, ge=0, description="Estimated cost in USD")
-    hours: Optional[str] = Field(default=None, description="Opening hours")
-    description: Optional[str] = Field(default=None, description="Place description")
-    rating: Optional[float] = Field(default=None, ge=0, le=5, description="Rating (0-5)")
-    time_needed: int = Field(default=120, description="Estimated time needed in minutes")
-    address: Optional[str] = Field(default=None, description="Street address")
+@dataclass(slots=True, frozen=True)
+class Place:
+    """
+    A point of interest (POI) with location and cost information.
+    
+    Places are built internally from API data and shared read-only between
+    ranking, days and the UI, so they skip Pydantic validation.
+    """
+    
+    name: str  # Place name
+    category: str  # Place category (e.g., museum, park, restaurant)
+    latitude: float  # Latitude coordinate
+    longitude: float  # Longitude coordinate
+    estimated_cost: float = 0.0  # Estimated cost in USD
+    hours: Optional[str] = None  # Opening hours
+    description: Optional[str] = None  # Place description
+    rating: Optional[float] = None  # Rating (0-5)
+    time_needed: int = 120  # Estimated time needed in minutes
+    address: Optional[str] = None  # Street address
     
     @property
     def coordinates(self) -> tuple[float, float]:
         """Return coordinates as a tuple."""
         return (self.latitude, self.longitude)
+    
+    @property
+    def coords_e5(self) -> tuple[int, int]:
+        """Coordinates in 1e-5 degree units (~1 m), small enough for int32."""
+        return (round(self.latitude * 1e5), round(self.longitude * 1e5))
 
 
-class DayPlan(BaseModel):
-    """A single day's itinerary with planned places and costs."""
+@dataclass(frozen=True)
+class DayPlan:
+    """
+    A single day's itinerary with planned places and costs.
     
-    day_index: int = Field(..., ge=1, description="Day number (1-indexed)")
-    day_date: date = Field(..., description="Date of this day")
-    places: List[Place] = Field(default_factory=list, description="List of places to visit")
-    total_cost: float = Field(default=0.0, ge=0, description="Total cost for this day in USD")
-    notes: Optional[str] = Field(default=None, description="Additional notes for the day")
+    Aggregates are cached on first access, so plans are treated as immutable once built.
+    """
     
-    @property
+    day_index: int  # Day number (1-indexed)
+    day_date: date  # Date of this day
+    places: List[Place] = field(default_factory=list)  # List of places to visit
+    total_cost: float = 0.0  # Total cost for this day in USD
+    notes: Optional[str] = None  # Additional notes for the day
+    
+    @cached_property
     def place_count(self) -> int:
         """Number of places in this day's plan."""
         return len(self.places)
     
-    @property
+    @cached_property
     def total_time(self) -> int:
         """Total estimated time in minutes for all activities."""
         return sum(place.time_needed for place in self.places)
 
 
-class Itinerary(BaseModel):
-    """Complete trip itinerary with all days and summary information."""
+@dataclass(frozen=True)
+class Itinerary:
+    """
+    Complete trip itinerary with all days and summary information.
     
-    trip_request: TripRequest = Field(..., description="Original trip request")
-    days: List[DayPlan] = Field(default_factory=list, description="Daily plans")
-    total_cost: float = Field(default=0.0, ge=0, description="Total estimated cost in USD")
-    notes: Optional[str] = Field(default=None, description="General trip notes")
-    created_at: datetime = Field(default_factory=datetime.now, description="When itinerary was created")
+    Summary fields are computed at construction and array aggregates on first
+    access, so itineraries are treated as immutable once built.
+    """
     
-    @property
-    def num_days(self) -> int:
-        """Number of days in the itinerary."""
-        return len(self.days)
+    trip_request: TripRequest  # Original trip request
+    days: List[DayPlan] = field(default_factory=list)  # Daily plans
+    total_cost: float = 0.0  # Total estimated cost in USD
+    notes: Optional[str] = None  # General trip notes
+    created_at: datetime = field(default_factory=datetime.now)  # When itinerary was created
     
-    @property
-    def total_places(self) -> int:
-        """Total number of places across all days."""
-        return sum(day.place_count for day in self.days)
+    # Summary fields derived from the above in __post_init__
+    num_days: int = field(init=False)  # Number of days in the itinerary
+    total_places: int = field(init=False)  # Total number of places across all days
+    budget_remaining: float = field(init=False)  # Remaining budget after planned expenses
+    budget_used_percentage: float = field(init=False)  # Percentage of budget used
     
-    @property
-    def budget_remaining(self) -> float:
-        """Remaining budget after planned expenses."""
-        return self.trip_request.budget - self.total_cost
+    def __post_init__(self):
+        """Precompute the summary fields, which the UI reads many times per render."""
+        budget = self.trip_request.budget
+        # The dataclass is frozen, so assign through object.__setattr__
+        object.__setattr__(self, "num_days", len(self.days))
+        object.__setattr__(self, "total_places", sum(day.place_count for day in self.days))
+        object.__setattr__(self, "budget_remaining", budget - self.total_cost)
+        object.__setattr__(
+            self, "budget_used_percentage", 0.0 if budget == 0 else (self.total_cost / budget) * 100
+        )
     
-    @property
-    def budget_used_percentage(self) -> float:
-        """Percentage of budget used."""
-        if self.trip_request.budget == 0:
-            return 0.0
-        return (self.total_cost / self.trip_request.budget) * 100
+    @cached_property
+    def cost_array(self) -> np.ndarray:
+        """Estimated per-person cost of every scheduled place, in day order."""
+        return np.fromiter(
+            (place.estimated_cost for day in self.days for place in day.places),
+            dtype=np.float64,
+            count=self.total_places
+        )
+    
+    @cached_property
+    def day_boundaries(self) -> np.ndarray:
+        """Offsets into cost_array where each day starts, plus the end offset."""
+        return np.cumsum([0] + [day.place_count for day in self.days])
+    
+    @cached_property
+    def day_place_costs(self) -> np.ndarray:
+        """Per-person cost of the places scheduled on each day."""
+        starts = self.day_boundaries[:-1]
+        # reduceat needs in-range indices and returns the element itself for empty
+        # segments, so pad the array and zero out days without places
+        totals = np.add.reduceat(np.append(self.cost_array, 0.0), starts)
+        totals[starts == self.day_boundaries[1:]] = 0.0
+        return totals
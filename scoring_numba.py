@@ -0,0 +1,101 @@
+"""
+Compiled scoring kernel for ranking places.
+Uses Numba when it is installed and falls back to an equivalent NumPy implementation otherwise.
+"""
+
+import math
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+EARTH_DIAMETER_KM = 12742.0  # 2 * Earth's radius (6371 km)
+
+
+def score_places_np(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    costs: np.ndarray,
+    ratings: np.ndarray,
+    interest_hits: np.ndarray,
+    city_lat: float,
+    city_lon: float,
+    daily_budget: float
+) -> np.ndarray:
+    """
+    Score places by interest match, proximity to the city center, rating and cost.
+
+    Args:
+        lats: Place latitudes
+        lons: Place longitudes
+        costs: Estimated cost per person
+        ratings: Ratings, NaN where unknown
+        interest_hits: Number of interests matched by each place
+        city_lat: City center latitude
+        city_lon: City center longitude
+        daily_budget: Daily budget of the trip
+
+    Returns:
+        Array of scores, higher is more relevant
+    """
+    # Interest match score (5 per matching interest)
+    score = interest_hits * 5.0
+
+    # Proximity score (closer to center = higher score, max 5)
+    delta_lat = np.radians(lats - city_lat)
+    delta_lon = np.radians(lons - city_lon)
+    a = (
+        np.sin(delta_lat / 2) ** 2
+        + math.cos(math.radians(city_lat)) * np.cos(np.radians(lats)) * np.sin(delta_lon / 2) ** 2
+    )
+    distance = EARTH_DIAMETER_KM * np.arcsin(np.sqrt(a))
+    score += np.maximum(0.0, 5 - distance / 2)
+
+    # Rating score (0-5)
+    score += np.nan_to_num(ratings)
+
+    # Lower cost = slightly higher score for budget travelers
+    score += np.where(costs < daily_budget / 3, 2.0, 0.0)
+
+    return score
+
+
+def _score_places_loop(lats, lons, costs, ratings, interest_hits, city_lat, city_lon, daily_budget):
+    """Loop form of score_places_np, written for Numba to compile."""
+    n = lats.shape[0]
+    score = np.empty(n)
+
+    city_lat_rad = math.radians(city_lat)
+    cos_city_lat = math.cos(city_lat_rad)
+    cheap_threshold = daily_budget / 3
+
+    for i in range(n):
+        lat_rad = math.radians(lats[i])
+        delta_lat = lat_rad - city_lat_rad
+        delta_lon = math.radians(lons[i] - city_lon)
+        a = math.sin(delta_lat / 2) ** 2 + cos_city_lat * math.cos(lat_rad) * math.sin(delta_lon / 2) ** 2
+        distance = EARTH_DIAMETER_KM * math.asin(math.sqrt(a))
+
+        s = interest_hits[i] * 5.0 + max(0.0, 5 - distance / 2)
+        if not math.isnan(ratings[i]):
+            s += ratings[i]
+        if costs[i] < cheap_threshold:
+            s += 2.0
+        score[i] = s
+
+    return score
+
+
+if NUMBA_AVAILABLE:
+    # Every fast-math flag except "nnan", which would let LLVM drop the isnan() check on ratings
+    score_places = njit(cache=True, fastmath={"nsz", "arcp", "contract", "afn", "reassoc"})(_score_places_loop)
+
+    # Pay the JIT compile (or cache load) at import time instead of on the first itinerary
+    _one = np.zeros(1)
+    score_places(_one, _one, _one, _one, _one, 0.0, 0.0, 1.0)
+else:
+    score_places = score_places_np